@@ -0,0 +1,10 @@
+import os
+import sys
+import types
+
+# The scripts import each other through the `bns` package (python3 -m bns.<project>.<script>),
+# so make this checkout importable under that name whatever its directory is called
+if "bns" not in sys.modules:
+    bns = types.ModuleType("bns")
+    bns.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+    sys.modules["bns"] = bns
@@ -0,0 +1,99 @@
+import time
+import orjson
+
+# Batch states after which the job will not make any further progress
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Most requests the Batch API accepts in a single job
+MAX_BATCH_REQUESTS = 50_000
+
+def submit_batch(
+    client,
+    bodies,
+    endpoint="/v1/responses",
+    poll_interval=30,
+    max_requests=MAX_BATCH_REQUESTS
+):
+    """
+    Submits request bodies (keyed by custom_id) as OpenAI Batch API jobs, waits for
+    them to finish and yields (custom_id, response body) pairs as the output files
+    are parsed. Requests that failed inside a batch are not yielded. More bodies
+    than one job accepts are split across several jobs, all submitted up front.
+    """
+    # An empty input file is rejected by the API, and there is nothing to wait for
+    if not bodies:
+        return
+
+    items = list(bodies.items())
+    batches = [
+        create_batch(client, items[start:start + max_requests], endpoint)
+        for start in range(0, len(items), max_requests)
+    ]
+    for batch in batches:
+        yield from batch_results(client, batch, poll_interval)
+
+def create_batch(client, items, endpoint):
+    """
+    Uploads (custom_id, body) pairs as a batch input file and starts a job for it.
+    """
+    # One JSONL line per request, uploaded as the batch input file
+    lines = [
+        orjson.dumps({"custom_id": custom_id, "method": "POST", "url": endpoint, "body": body})
+        for custom_id, body in items
+    ]
+    input_file = client.files.create(
+        file=("batch_input.jsonl", b"\n".join(lines)),
+        purpose="batch"
+    )
+    return client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=endpoint,
+        completion_window="24h"
+    )
+
+def batch_results(client, batch, poll_interval):
+    """
+    Waits for a batch job to finish and yields its successful (custom_id, body) pairs.
+    """
+    # Poll until the batch reaches a terminal state
+    while batch.status not in TERMINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+
+    if batch.output_file_id:
+        content = client.files.content(batch.output_file_id).content
+        for result in iter_jsonl(content):
+            response = result.get("response")
+            if response and response.get("status_code") == 200:
+                yield result["custom_id"], response["body"]
+
+def iter_jsonl(content):
+    """
+    Parses JSONL bytes one line at a time. Lines are handed to orjson as
+    memoryview slices, so the buffer is never decoded or split into copies.
+    """
+    view = memoryview(content)
+    start = 0
+    while start < len(content):
+        end = content.find(b"\n", start)
+        if end == -1:
+            end = len(content)
+        if end > start:
+            yield orjson.loads(view[start:end])
+        start = end + 1
+
+def output_text(body):
+    """
+    Returns the text output of a raw Responses API body, the same way the
+    SDK's `output_text` property does for regular calls.
+    """
+    return "".join(
+        part.get("text", "")
+        for item in body.get("output", [])
+        if item.get("type") == "message"
+        for part in item.get("content", [])
+        if part.get("type") == "output_text"
+    )
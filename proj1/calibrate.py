@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import csv
+import random
+import statistics
+from itertools import islice
+
+from bns.proj1.script import (
+    MODEL,
+    ModelSession,
+    classify_ticket,
+    input_path,
+    investor_key,
+    is_investor_name,
+    iter_investor_names,
+    positive_int
+)
+
+# Sizes within this factor of each other count as agreeing
+AGREEMENT_FACTOR = 2
+
+def sample_investors(names, size, seed=None):
+    """
+    Returns a random sample of up to `size` distinct, researchable investor names.
+    """
+    distinct = {}
+    for name in names:
+        if is_investor_name(name):
+            distinct.setdefault(investor_key(name), name)
+    investors = sorted(distinct.values())
+    return random.Random(seed).sample(investors, min(size, len(investors)))
+
+def compare(ticket_size, reference_size):
+    """
+    Classifies one investor's pair of answers: 'error' if either call failed,
+    'both null', 'model null' (the fallback would catch these), 'reference null',
+    'agree' (within AGREEMENT_FACTOR of each other) or 'disagree'.
+    """
+    if isinstance(ticket_size, Exception) or isinstance(reference_size, Exception):
+        return "error"
+    if ticket_size is None:
+        return "both null" if reference_size is None else "model null"
+    if reference_size is None:
+        return "reference null"
+    if not ticket_size or not reference_size:
+        return "agree" if ticket_size == reference_size else "disagree"
+    ratio = ticket_size / reference_size
+    return "agree" if 1 / AGREEMENT_FACTOR <= ratio <= AGREEMENT_FACTOR else "disagree"
+
+def summarise(pairs):
+    """
+    Counts the comparison outcomes of (ticket_size, reference_size) pairs and adds the
+    median model/reference ratio over investors both models put a size on.
+    """
+    summary = {outcome: 0 for outcome in
+               ("agree", "disagree", "model null", "reference null", "both null", "error")}
+    ratios = []
+    for ticket_size, reference_size in pairs:
+        outcome = compare(ticket_size, reference_size)
+        summary[outcome] += 1
+        if outcome in ("agree", "disagree") and reference_size:
+            ratios.append(ticket_size / reference_size)
+    summary["median ratio"] = statistics.median(ratios) if ratios else None
+    return summary
+
+async def research_both(names, model, reference, max_parallel_requests):
+    """
+    Researches every investor with both models, without the response cache, and
+    returns (ticket_size, reference_size) pairs with the exception for failed calls.
+    """
+    async def ticket_size(name, session, model):
+        try:
+            return (await classify_ticket(name, session, None, model))[1]
+        except Exception as e:
+            return e
+
+    async with ModelSession(max_parallel_requests) as session:
+        sizes = await asyncio.gather(*(
+            ticket_size(name, session, m) for name in names for m in (model, reference)
+        ))
+    return list(zip(sizes[::2], sizes[1::2]))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the research model's ticket sizes with a reference model's on a sample of investors."
+    )
+    parser.add_argument("--reference", required=True, help="Stronger model to compare against, e.g. gpt-4o.")
+    parser.add_argument("--model", default=MODEL, help="Model under test (default: %(default)s).")
+    parser.add_argument("--input", default=input_path, help="Input CSV to sample from (default: %(default)s).")
+    parser.add_argument("--sample", type=positive_int, default=50, help="Investors to sample (default: %(default)s).")
+    parser.add_argument("--seed", type=int, help="Random seed, to repeat a sample.")
+    parser.add_argument("--max-items", type=int, help="Only sample from the first N rows of the input.")
+    parser.add_argument(
+        "--output",
+        default="data/calibration.csv",
+        help="Per-investor comparison CSV (default: %(default)s)."
+    )
+    parser.add_argument("--max-parallel-requests", type=positive_int, default=20)
+    args = parser.parse_args()
+
+    names = iter_investor_names(args.input)
+    if args.max_items:
+        names = islice(names, args.max_items)
+    sample = sample_investors(names, args.sample, args.seed)
+    pairs = asyncio.run(research_both(sample, args.model, args.reference, args.max_parallel_requests))
+
+    with open(args.output, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Investor', args.model, args.reference, 'Outcome'])
+        for name, (ticket_size, reference_size) in zip(sample, pairs):
+            writer.writerow([name, ticket_size, reference_size, compare(ticket_size, reference_size)])
+
+    summary = summarise(pairs)
+    print(f"{args.model} vs {args.reference} on {len(sample)} investors (details in {args.output}):")
+    for outcome, count in summary.items():
+        print(f"  {outcome}: {count}")
+
+if __name__ == "__main__":
+    main()
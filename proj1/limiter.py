@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that follows the API's rate-limit feedback (AIMD):
+    halved whenever a call is rate limited, and raised by one after every
+    `increase_every` successful calls that still report spare request quota.
+    Used as `async with limiter:` around each call.
+    """
+
+    def __init__(self, initial, maximum, minimum=1, increase_every=10):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase_every = increase_every
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    async def on_success(self, remaining_requests):
+        """
+        Records a successful call. `remaining_requests` is the value of the
+        x-ratelimit-remaining-requests header, or None if it wasn't sent.
+        """
+        async with self.condition:
+            # Only grow while the quota has room for more than what's in flight
+            if remaining_requests is not None and int(remaining_requests) <= self.in_flight:
+                self.successes = 0
+                return
+            self.successes += 1
+            if self.successes >= self.increase_every and self.limit < self.maximum:
+                self.limit += 1
+                self.successes = 0
+                self.condition.notify_all()
+
+    async def on_rate_limited(self):
+        """
+        Records a rate-limited call and halves the limit.
+        """
+        async with self.condition:
+            self.limit = max(self.minimum, self.limit // 2)
+            self.successes = 0
+
+class RateLimiter:
+    """
+    Token-bucket throttle for requests and tokens per minute. Each bucket
+    refills continuously at its per-minute rate, up to one minute's worth,
+    and `acquire` waits until both can cover the next call. A limit of None
+    disables that bucket. `clock` and `sleep` can be replaced to run it on a
+    fake clock.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        clock=time.monotonic,
+        sleep=asyncio.sleep
+    ):
+        self.capacities = (requests_per_minute, tokens_per_minute)
+        self.levels = [capacity or 0 for capacity in self.capacities]
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        # Held while waiting, so callers are served in arrival order
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = now - self.updated
+        self.updated = now
+        for i, capacity in enumerate(self.capacities):
+            if capacity:
+                self.levels[i] = min(capacity, self.levels[i] + capacity * elapsed / 60)
+
+    async def acquire(self, tokens=0):
+        """
+        Waits until one more request using roughly `tokens` tokens fits within
+        both limits, then takes it out of the buckets.
+        """
+        # A call larger than a whole minute's budget only waits for a full bucket
+        needs = [
+            min(need, capacity) if capacity else 0
+            for need, capacity in zip((1, tokens), self.capacities)
+        ]
+        async with self.lock:
+            while True:
+                self._refill()
+                waits = [
+                    (need - level) * 60 / capacity
+                    for need, level, capacity in zip(needs, self.levels, self.capacities)
+                    if capacity and level < need
+                ]
+                if not waits:
+                    break
+                await self.sleep(max(waits))
+            for i, need in enumerate(needs):
+                self.levels[i] -= need
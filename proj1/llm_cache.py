@@ -0,0 +1,46 @@
+import hashlib
+import sqlite3
+
+def hash_prompt(prompt, model=""):
+    """
+    Returns the SHA-256 hex digest used as the cache key for a prompt. The model
+    name is part of the key, so switching models doesn't serve another model's answers.
+    """
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    On-disk store of model responses keyed by prompt hash, backed by SQLite.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "prompt_hash TEXT PRIMARY KEY, "
+            "response TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, prompt_hash):
+        """
+        Returns the cached response for a prompt hash, or None on a miss.
+        """
+        row = self.conn.execute(
+            "SELECT response FROM responses WHERE prompt_hash = ?", (prompt_hash,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, prompt_hash, response):
+        """
+        Stores (or replaces) the response for a prompt hash.
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (prompt_hash, response) VALUES (?, ?)",
+            (prompt_hash, response)
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -1,97 +1,816 @@
 import os
 import csv
+import argparse
 import pandas as pd
-import json
+import orjson
+import asyncio
+import threading
+import hashlib
+import struct
 import configparser
-from openai import OpenAI
+import httpx
+import importlib.util
+import logging
+from openai import AsyncOpenAI, OpenAI, APIConnectionError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 import re
+from collections import Counter, deque
+from itertools import chain, islice
+
+from bns.proj1.batch import submit_batch, output_text
+from bns.proj1.limiter import AdaptiveLimiter, RateLimiter
+from bns.proj1.llm_cache import LLMCache, hash_prompt
+
+logger = logging.getLogger(__name__)
 
 # Read API key from config file
 config = configparser.ConfigParser()
 config.read('config.ini')
 api_key = config['openai']['api_key']
 
-# Create a new OpenAI client
-client = OpenAI(api_key=api_key)
+# Small model by default: extracting one figure per investor doesn't need a frontier model.
+# BNS_FALLBACK_MODEL, if set, re-researches only the investors it can't put a size on.
+MODEL = os.environ.get("BNS_LLM_MODEL", "gpt-4o-mini")
+FALLBACK_MODEL = os.environ.get("BNS_FALLBACK_MODEL")
+TOOLS = [{"type": "web_search_preview"}]
+
+# Strict structured output: replies are guaranteed to parse and match these schemas
+TICKET_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "investor": {"type": "string"},
+        "ticket_size": {"type": ["integer", "null"]},
+        "rationale": {"type": "string"}
+    },
+    "required": ["investor", "ticket_size", "rationale"],
+    "additionalProperties": False
+}
+TEXT_FORMAT = {
+    "format": {"type": "json_schema", "name": "ticket", "schema": TICKET_SCHEMA, "strict": True}
+}
+BATCH_TEXT_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "tickets",
+        "schema": {
+            "type": "object",
+            "properties": {"results": {"type": "array", "items": TICKET_SCHEMA}},
+            "required": ["results"],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+
+# Research instructions shared by the single and multi-investor prompts
+RESEARCH_STEPS = (
+    "1. Find all **direct equity investments made by the investor** (exclude any investments into other funds) closed since 2020.\n"
+    "2. For each deal, list:\n"
+    "- Company name\n"
+    "- **Amount invested by investor** (USD, integer)\n"
+    "- Year of the deal\n"
+    "- Credible source URL\n"
+    "3. From that list, determine the investor’s **single largest investment** (i.e. the highest amount they put into any one company).\n"
+    "4. If an exact amount isn’t publicly disclosed, provide a well-reasoned ticket size estimate (based on comparable deals or typical ticket sizes) and cite your rationale.\n"
+)
+
+# Names made up only of digits, whitespace and separators (e.g. IDs or blank cells)
+NON_NAME_RE = re.compile(r"[\d\s\-_./]*")
+
+# Number of investors packed into a single prompt
+CHUNK_SIZE = 10
+
+# Static instructions, sent as the Responses API `instructions` so every call
+# starts with the same prefix and can reuse the provider's prompt cache;
+# only the short per-call input names the investor(s)
+INSTRUCTIONS = (
+    "You are a professional investment analyst with access to public investment databases (e.g., Crunchbase, PitchBook, Dealroom) and press releases.\n\n"
+    "For the investor named in the input, perform these steps:\n"
+    + RESEARCH_STEPS +
+    "Respond **only** with a JSON object matching this schema exactly:\n"
+    '{ "investor": <string>, "ticket_size": <integer>, "rationale": "<URL or brief explanation for this figure>" }'
+)
+BATCH_INSTRUCTIONS = (
+    "You are a professional investment analyst with access to public investment databases (e.g., Crunchbase, PitchBook, Dealroom) and press releases.\n\n"
+    "For each investor in the JSON list given as input, perform these steps:\n"
+    + RESEARCH_STEPS +
+    "Respond **only** with a JSON object whose \"results\" array holds exactly one object per investor, "
+    "in the same order as the input, each matching this schema exactly:\n"
+    '{ "results": [{ "investor": <string>, "ticket_size": <integer>, "rationale": "<URL or brief explanation for this figure>" }, ...] }'
+)
+
+# Most Azure/OpenAI calls ever in flight (not CPU threads: the calls are network-bound).
+# The number in flight is adjusted at runtime from rate-limit feedback but never
+# exceeds this; can be overridden with BNS_MAX_WORKERS or --max-parallel-requests.
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("BNS_MAX_WORKERS", 100))
+if MAX_CONCURRENT_REQUESTS < 1:
+    raise ValueError(f"BNS_MAX_WORKERS must be at least 1, got {MAX_CONCURRENT_REQUESTS}")
+
+# Number of calls in flight at start, before any rate-limit feedback has come in
+INITIAL_CONCURRENT_REQUESTS = 20
 
-def prompt_model(prompt):
+# Chunk tasks created ahead of their results being written, per allowed prompt in flight
+PENDING_CHUNKS_PER_REQUEST = 4
+
+# Proactive throttle to stay under the deployment's quota instead of running into 429s.
+# Set BNS_RPM / BNS_TPM to its requests / tokens per minute; unset means unthrottled.
+REQUESTS_PER_MINUTE = int(os.environ["BNS_RPM"]) if os.environ.get("BNS_RPM") else None
+TOKENS_PER_MINUTE = int(os.environ["BNS_TPM"]) if os.environ.get("BNS_TPM") else None
+
+class ModelSession:
     """
-    Sends the prompt to the model and returns the response.
+    Per-run state for calling the model: an async OpenAI client on one shared HTTP/2
+    connection pool, so concurrent prompts are multiplexed over a few persistent TLS
+    connections, the adaptive limit on calls in flight and the requests/tokens per
+    minute throttle. Used as
+    `async with ModelSession(...) as session:` inside the event loop that makes the
+    calls, which closes the pool when the run ends.
     """
-    completion = client.responses.create(
-        model="gpt-4o-mini",
-        tools=[{"type": "web_search_preview"}],
-        input=prompt
-    )
-    return completion.output_text
 
-def classify_ticket(name):
+    def __init__(self, max_parallel_requests=MAX_CONCURRENT_REQUESTS):
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            # prompt_model's own retries are the only retry layer, so every attempt
+            # goes through the throttles and reports 429s to the limiter
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                # HTTP/2 needs the optional h2 package (httpx[http2]); without it
+                # the pool falls back to HTTP/1.1 keep-alive connections
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            )
+        )
+        self.limiter = AdaptiveLimiter(
+            min(INITIAL_CONCURRENT_REQUESTS, max_parallel_requests),
+            max_parallel_requests
+        )
+        self.rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.close()
+
+def estimate_tokens(prompt):
+    """
+    Roughly estimates a prompt's size in tokens (about four characters per token).
+    """
+    return len(prompt) // 4
+
+# Transient failures worth retrying (429s, dropped connections and timeouts, 5xx).
+# Anything else, e.g. authentication or invalid request errors, fails immediately.
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+@retry(
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(5),
+    # Surface the last API error itself rather than tenacity's RetryError wrapper
+    reraise=True
+)
+async def prompt_model(prompt, session, instructions=INSTRUCTIONS, text_format=TEXT_FORMAT, model=MODEL):
+    """
+    Sends the prompt, after the static instructions, to the model and returns the response.
+    Each attempt holds a limiter slot and reports the rate-limit headers back to it;
+    transient failures are retried with jittered exponential backoff.
+    """
+    limiter = session.limiter
+    await session.rate_limiter.acquire(estimate_tokens(instructions) + estimate_tokens(prompt))
+    async with limiter:
+        try:
+            response = await session.client.responses.with_raw_response.create(
+                model=model,
+                tools=TOOLS,
+                text=text_format,
+                instructions=instructions,
+                input=prompt
+            )
+        except RateLimitError:
+            await limiter.on_rate_limited()
+            raise
+    await limiter.on_success(response.headers.get("x-ratelimit-remaining-requests"))
+    return response.parse().output_text
+
+def build_prompt(name):
+    """
+    Builds the per-call input for researching a given investor name.
+    """
+    return "Investor: " + name
+
+def build_batch_prompt(names):
+    """
+    Builds the per-call input for researching several investor names at once.
+    """
+    return "Investors: " + orjson.dumps(names).decode()
+
+def to_ticket(data):
+    """
+    Extracts (investor, ticket_size, rationale) from a parsed reply object.
+    """
+    investor = data.get("investor")
+    rationale = data.get("rationale")
+    ticket_size = data.get("ticket_size")
+
+    logger.info("Investor: %s, Ticket size: %s, Rationale: %s", investor, ticket_size, rationale)
+
+    return investor, ticket_size, rationale
+
+def is_investor_name(name):
+    """
+    Returns False for blank or purely numeric entries that the model can't research.
+    """
+    return not NON_NAME_RE.fullmatch(name)
+
+def cache_key(name, model=MODEL, instructions=INSTRUCTIONS):
+    """
+    Returns the cache key for an investor's answer: the hash of the instructions that
+    produced it (single-investor or packed), the investor's own input and the model,
+    so editing either set of instructions or switching models invalidates it.
+    """
+    return hash_prompt(instructions + "\n\n" + build_prompt(name), model)
+
+def cached_answer(cache, name, model=MODEL):
+    """
+    Returns a model's cached (investor, ticket_size, rationale) for an investor, from
+    a single-investor or a packed prompt, or None on a miss.
+    """
+    for instructions in (INSTRUCTIONS, BATCH_INSTRUCTIONS):
+        response = cache.get(cache_key(name, model, instructions))
+        if response is not None:
+            return to_ticket(orjson.loads(response))
+    return None
+
+def cached_ticket(cache, name):
+    """
+    Returns the cached (investor, ticket_size, rationale) for an investor, or None on a miss.
+    If the primary model found no ticket size and FALLBACK_MODEL is set, the fallback
+    model's answer is used instead; without one it is a miss, so the fallback still runs.
+    """
+    ticket = cached_answer(cache, name)
+    if ticket is None or ticket[1] is not None or not FALLBACK_MODEL:
+        return ticket
+    fallback = cached_answer(cache, name, FALLBACK_MODEL)
+    if fallback is None:
+        return None
+    return fallback if fallback[1] is not None else ticket
+
+def cache_ticket(cache, name, data, model=MODEL, instructions=INSTRUCTIONS):
+    """
+    Stores a successfully parsed result under the investor's own key rather than the
+    whole prompt's, so it is found again however the investors get chunked on the next run.
+    """
+    if cache is not None:
+        cache.set(cache_key(name, model, instructions), orjson.dumps(data).decode())
+
+async def classify_ticket(name, session, cache, model=MODEL):
     """
     Calls the OpenAI API to estimate ticket size and rationale for a given investor name.
     Expects the model to return a JSON object with 'ticket_size' and 'rationale' fields.
+    API errors (once retries are exhausted) and unparseable replies are raised, so a
+    failed call is never mistaken for the model finding no ticket size.
     """
-    prompt = (
-        "You are a professional investment analyst with access to public investment databases (e.g., Crunchbase, PitchBook, Dealroom) and press releases.\n\n"
-        f"Investor: {name}\n\n"
-        "For the investor above, perform these steps:\n"
-        "1. Find all **direct equity investments made by the investor** (exclude any investments into other funds) closed since 2020.\n"
-        "2. For each deal, list:\n"
-        "- Company name\n"
-        "- **Amount invested by investor** (USD, integer)\n"
-        "- Year of the deal\n"
-        "- Credible source URL\n"
-        "3. From that list, determine the investor’s **single largest investment** (i.e. the highest amount they put into any one company).\n"
-        "4. If an exact amount isn’t publicly disclosed, provide a well-reasoned ticket size estimate (based on comparable deals or typical ticket sizes) and cite your rationale.\n"
-        "Respond **only** in valid JSON, matching this schema exactly (no extra text):\n"
-        "```json\n"
-        '{ "investor": <string>, "ticket_size": <integer>, "rationale": "<URL or brief explanation for this figure>" }'
-    )
+    raw_output = await prompt_model(build_prompt(name), session, model=model)
+    data = orjson.loads(raw_output)
+    ticket = to_ticket(data)
+    cache_ticket(cache, name, data, model)
+    return ticket
 
+async def with_fallback(name, ticket, session, cache):
+    """
+    Re-researches an investor the primary model couldn't put a ticket size on
+    with FALLBACK_MODEL, keeping the original result unless the fallback finds one.
+    """
+    if isinstance(ticket, Exception) or ticket[1] is not None:
+        return ticket
     try:
-        raw_output = prompt_model(prompt)
-        cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw_output.strip(), flags=re.IGNORECASE)
+        fallback = await classify_ticket(name, session, cache, FALLBACK_MODEL)
+    except Exception as e:
+        # The primary model's answer is still a valid result
+        logger.warning("Fallback model failed for %s: %s", name, e)
+        return ticket
+    return fallback if fallback[1] is not None else ticket
 
-        # Parse JSON
-        data = json.loads(cleaned)
+async def research_tickets(names, session, cache):
+    """
+    Estimates ticket sizes for several investors with a single prompt to the primary model.
+    Falls back to one prompt per investor if the reply can't be matched to the input.
+    Returns one entry per name: its ticket, or the exception its research failed with.
+    An API error on the shared prompt is returned for every name rather than retried
+    per investor, which would only multiply the load while the API is failing.
+    """
+    if not names:
+        return []
+    if len(names) == 1:
+        tickets = await asyncio.gather(classify_ticket(names[0], session, cache), return_exceptions=True)
+    else:
+        try:
+            raw_output = await prompt_model(
+                build_batch_prompt(names),
+                session,
+                BATCH_INSTRUCTIONS,
+                BATCH_TEXT_FORMAT
+            )
+        except Exception as e:
+            return [e] * len(names)
+        try:
+            results = orjson.loads(raw_output).get("results")
+            if not isinstance(results, list) or len(results) != len(names):
+                raise ValueError("reply does not contain one result per investor")
+            tickets = [to_ticket(item) for item in results]
+            for name, item in zip(names, results):
+                cache_ticket(cache, name, item, instructions=BATCH_INSTRUCTIONS)
+        except (ValueError, AttributeError):
+            # An unparseable reply (orjson.JSONDecodeError is a ValueError) or one that
+            # can't be matched to the input: research these investors one at a time
+            tickets = await asyncio.gather(
+                *(classify_ticket(name, session, cache) for name in names),
+                return_exceptions=True
+            )
 
-        # Extract values
-        investor = data.get("investor")
-        rationale = data.get("rationale")
-        ticket_size = data.get("ticket_size")
+    return list(tickets)
 
-        print(f"Investor: {investor}, Ticket size: {ticket_size}, Rationale: {rationale}")
-        
-        return investor, ticket_size, rationale
-    except Exception as e:
-        # Fallback or logging
-        return None, f"Error: {str(e)}"
+async def classify_tickets(names, session, cache):
+    """
+    Researches several investors with the primary model (see research_tickets), then
+    with FALLBACK_MODEL (if set) those left without a ticket size. Returns one entry
+    per name: its ticket, or the exception its research failed with.
+    """
+    if not FALLBACK_MODEL:
+        return await research_tickets(names, session, cache)
+
+    # An investor only gets here with its primary answer cached if that answer had no
+    # ticket size and the fallback hasn't run yet, so it skips the primary model
+    known = {}
+    if cache is not None:
+        known = {name: ticket for name in names if (ticket := cached_answer(cache, name)) is not None}
+    researched = iter(await research_tickets([name for name in names if name not in known], session, cache))
+    tickets = [known[name] if name in known else next(researched) for name in names]
+
+    return await asyncio.gather(*(
+        with_fallback(name, ticket, session, cache)
+        for name, ticket in zip(names, tickets)
+    ))
+
+def classify_tickets_batch(names, cache):
+    """
+    Estimates ticket sizes for all investor names through the Batch API (one job per 50,000).
+    Yields (name, (investor, ticket_size, rationale)) pairs as the batch output is read,
+    with the exception in place of the ticket for investors whose request failed.
+    """
+    bodies = {
+        str(i): {
+            "model": MODEL,
+            "tools": TOOLS,
+            "text": TEXT_FORMAT,
+            "instructions": INSTRUCTIONS,
+            "input": build_prompt(name)
+        }
+        for i, name in enumerate(names)
+    }
+
+    # The Batch API is driven synchronously, so it gets its own blocking client
+    unanswered = set(range(len(names)))
+    for custom_id, body in submit_batch(OpenAI(api_key=api_key), bodies):
+        i = int(custom_id)
+        unanswered.discard(i)
+        name = names[i]
+        try:
+            data = orjson.loads(output_text(body))
+            ticket = to_ticket(data)
+            cache_ticket(cache, name, data)
+            yield name, ticket
+        except Exception as e:
+            yield name, e
+
+    for i in sorted(unanswered):
+        yield names[i], RuntimeError("no response in batch output")
+
+def iter_chunks(iterable, size):
+    """
+    Yields successive lists of up to `size` items from the iterable.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+# Rows written between fsyncs of the output file
+FSYNC_EVERY = 1000
+
+class TicketWriter:
+    """
+    Appends result rows to the output CSV, fsyncing every FSYNC_EVERY rows
+    so an interrupted run loses little work and can be resumed. Investors
+    written are also recorded in a sidecar index of 64-bit key hashes, so
+    the next run can resume without rescanning the CSV.
+    """
+
+    fieldnames = ['Investor', 'Ticket size (USD)', 'Rationale']
+
+    def __init__(self, csvfile, index_file):
+        self.csvfile = csvfile
+        self.index_file = index_file
+        self.writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames)
+        self.unsynced = 0
+        # Hashes are only appended to the index once their rows are synced,
+        # so the index never lists an investor the CSV doesn't have
+        self.unindexed = []
+        # Rows come both from the event loop and from worker threads
+        self.lock = threading.Lock()
+
+    def write_header(self):
+        self.writer.writeheader()
+
+    def write(self, results):
+        """
+        Writes (name, ticket, count) results in one call, one row per occurrence
+        of the investor in the input. Rows are keyed by the input name so that
+        resumed runs can recognise them.
+        """
+        rows = [
+            {
+                'Investor': name,
+                'Ticket size (USD)': ticket_size,
+                'Rationale': rationale
+            }
+            for name, (_, ticket_size, rationale), count in results
+            for _ in range(count)
+        ]
+        with self.lock:
+            self.writer.writerows(rows)
+            self.unindexed.extend(key_hash(investor_key(name)) for name, _, _ in results if name)
+            self.unsynced += len(rows)
+            if self.unsynced >= FSYNC_EVERY:
+                self.sync()
+
+    def sync(self):
+        self.csvfile.flush()
+        os.fsync(self.csvfile.fileno())
+        if self.unindexed:
+            self.index_file.write(b"".join(struct.pack("<Q", h) for h in self.unindexed))
+            self.index_file.flush()
+            os.fsync(self.index_file.fileno())
+            self.unindexed = []
+        else:
+            # Still mark the index as up to date with the CSV (see load_processed_names)
+            os.utime(self.index_file.name)
+        self.unsynced = 0
+
+def investor_key(name):
+    """
+    Normalises an investor name for deduplication, so listings that differ only in
+    case or spacing (e.g. "Tokyu land corporation" / "Tokyu Land Corporation") match.
+    """
+    return " ".join(name.split()).casefold()
+
+def key_hash(key):
+    """
+    Returns a 64-bit hash of an investor key. The resume set holds these small ints
+    rather than the name strings, which take several times the memory per entry.
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+def load_processed_names(path, index_path):
+    """
+    Returns the key hashes of investors that already have a result in the output CSV.
+    They are read from the sidecar index when it is at least as recent as the CSV;
+    otherwise the CSV is scanned once, skipping error rows left by older versions of
+    this script so those investors are retried, and the index is rebuilt from it.
+    """
+    if not os.path.exists(path):
+        # A leftover index without its CSV would skip investors that have no output
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        return set()
+
+    # An index older than the CSV is missing rows flushed after its last sync
+    # (e.g. when the process was killed), so the CSV is rescanned instead
+    if os.path.exists(index_path) and os.stat(index_path).st_mtime_ns >= os.stat(path).st_mtime_ns:
+        with open(index_path, 'rb') as index_file:
+            data = index_file.read()
+        # Ignore a partial trailing entry from an interrupted write
+        data = data[:len(data) - len(data) % 8]
+        return {h for (h,) in struct.iter_unpack("<Q", data)}
+
+    with open(path, newline='') as csvfile:
+        processed = {
+            key_hash(investor_key(row['Investor']))
+            for row in csv.DictReader(csvfile, skipinitialspace=True)
+            if row['Investor'] and not (row['Rationale'] or '').startswith('Error:')
+        }
+    with open(index_path, 'wb') as index_file:
+        index_file.write(b"".join(struct.pack("<Q", h) for h in processed))
+    return processed
+
+class InvestorTracker:
+    """
+    Deduplicates investors as they stream in from the input. Only the first
+    listing of an investor that still needs the model is passed on; repeats
+    are counted while it is in flight, or written straight away once its
+    result is known, so every input row still gets its output row (or, if
+    the research failed, its row in the failed-investor file).
+    """
+
+    def __init__(self, writer, cache, processed):
+        self.writer = writer
+        self.cache = cache
+        self.processed = processed
+        # Keys of investors waiting on the model -> times listed so far
+        self.occurrences = Counter()
+        # Keys of investors whose result has been written -> their result
+        self.tickets = {}
+
+    def filter(self, names):
+        """
+        Yields the investors that need the model, the first time each is listed.
+        Blank or numeric names, cached investors and repeats of known results are
+        written directly; investors already in the output are skipped.
+        """
+        for name in names:
+            key = investor_key(name)
+            if key_hash(key) in self.processed:
+                continue
+            if key in self.occurrences:
+                self.occurrences[key] += 1
+                continue
+            ticket = self.tickets.get(key)
+            if ticket is None:
+                if not is_investor_name(name):
+                    # Nothing to look up, so skip the model call entirely
+                    ticket = (name, None, None)
+                elif self.cache is not None:
+                    ticket = cached_ticket(self.cache, name)
+            if ticket is not None:
+                self.tickets[key] = ticket
+                self.writer.write([(name, ticket, 1)])
+            else:
+                self.occurrences[key] = 1
+                yield name
+
+    def resolve(self, names, tickets):
+        """
+        Records the model's results for investors passed on by `filter` and returns
+        them as (name, ticket, count) entries for TicketWriter.write, along with
+        (name, error, count) entries for investors whose research failed. Failed
+        investors are forgotten, so a later listing retries them.
+        """
+        results = []
+        failures = []
+        for name, ticket in zip(names, tickets):
+            key = investor_key(name)
+            count = self.occurrences.pop(key)
+            if isinstance(ticket, Exception):
+                failures.append((name, ticket, count))
+                continue
+            results.append((name, ticket, count))
+            self.tickets[key] = ticket
+        return results, failures
+
+class FailedInvestorWriter:
+    """
+    Records investors whose research failed in a CSV with the input's
+    'Potential investor' column, so they can be rerun with --input. The
+    file is only created once there is a failure to record; with no path,
+    failures are only logged and counted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.csvfile = None
+        self.count = 0
+
+    def write(self, failures):
+        """
+        Appends (name, error, count) failures, one row per occurrence of the
+        investor in the input, logging each failure once.
+        """
+        if not failures:
+            return
+        if self.csvfile is None and self.path is not None:
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self.csvfile = open(self.path, 'a', newline='')
+            self.writer = csv.writer(self.csvfile)
+            if new_file:
+                self.writer.writerow(['Potential investor'])
+        for name, error, count in failures:
+            logger.warning("Research failed for %s: %s", name, error)
+            if self.path is not None:
+                self.writer.writerows([name] for _ in range(count))
+            self.count += count
+
+    def close(self):
+        if self.csvfile is not None:
+            self.csvfile.close()
+
+def prune_failed_investors(path, done):
+    """
+    Drops the rows of investors whose key hash is in `done` from the failed-investor
+    file, replacing it atomically, and removes the file once no rows are left.
+    Returns the number of rows left.
+    """
+    with open(path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        remaining = [row for row in reader if row and key_hash(investor_key(row[0].strip())) not in done]
+    if not remaining:
+        os.remove(path)
+        return 0
+    with open(path + '.new', 'w', newline='') as csvfile:
+        csv.writer(csvfile).writerows([header, *remaining])
+    os.replace(path + '.new', path)
+    return len(remaining)
+
+async def classify_all(
+    names,
+    writer,
+    investors,
+    failed,
+    cache,
+    max_parallel_requests=MAX_CONCURRENT_REQUESTS,
+    chunk_size=CHUNK_SIZE
+):
+    """
+    Researches the investors concurrently, one task per chunk, and writes the
+    chunks' rows in input order as they complete. Chunks are taken lazily from
+    `names`, so the first prompts go out before the whole input has been read.
+    Investors that fail are passed to `failed` instead of getting a row.
+    """
+    max_pending_chunks = max_parallel_requests * PENDING_CHUNKS_PER_REQUEST
+    # (task, chunk) pairs in submission order; later chunks keep running while
+    # an earlier one is awaited, only their writes wait their turn
+    in_flight = deque()
+
+    async def write_oldest():
+        task, chunk = in_flight.popleft()
+        results, failures = investors.resolve(chunk, await task)
+        failed.write(failures)
+        # Write (and periodically fsync) off the event loop, so in-flight
+        # prompts keep being serviced while the disk catches up
+        await asyncio.to_thread(writer.write, results)
+
+    # The session's connections are closed while the event loop is still running
+    async with ModelSession(max_parallel_requests) as session:
+        for chunk in iter_chunks(names, chunk_size):
+            # Only create tasks a bounded distance ahead of the ones being written
+            while len(in_flight) >= max_pending_chunks:
+                await write_oldest()
+            in_flight.append((asyncio.create_task(classify_tickets(chunk, session, cache)), chunk))
+
+        while in_flight:
+            await write_oldest()
+
+def iter_investor_names(path, chunksize=10_000):
+    """
+    Streams the stripped investor names from the input CSV, reading only the name
+    column as plain strings (blank cells stay '' rather than NaN) one chunk at a time.
+    """
+    for df in pd.read_csv(
+        path,
+        usecols=['Potential investor'],
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunksize
+    ):
+        yield from df['Potential investor'].str.strip()
+
+# Fewest investors for which --batch auto goes through the Batch API
+BATCH_API_MIN_ITEMS = 50
 
 # Paths
 input_path = 'data/investor_list.csv'
 output_path = 'data/output.csv'
+index_path = 'data/output.csv.idx'
+failed_path = 'data/failed_investors.csv'
+output_buffer_size = 1024 * 1024
+cache_path = 'data/llm_cache.sqlite'
+
+def positive_int(value):
+    """
+    Parses a command-line count that must be at least 1.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
 
-# Read input CSV
-df = pd.read_csv(input_path)
+def main():
+    # Per-investor lines are INFO, so they're only printed with BNS_LOG=INFO
+    logging.basicConfig(level=os.environ.get("BNS_LOG", "WARNING").upper())
+
+    parser = argparse.ArgumentParser(description="Estimate investor ticket sizes with OpenAI.")
+    parser.add_argument(
+        "--input",
+        default=input_path,
+        help=f"CSV with a 'Potential investor' column (default: %(default)s; use {failed_path} to retry failures)."
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        choices=["always", "auto", "never"],
+        const="always",
+        default="never",
+        help=(
+            "Submit investors as Batch API jobs (cheaper, but may take up to 24h). "
+            f"'auto' only does so once at least {BATCH_API_MIN_ITEMS} investors need the model."
+        )
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore previously cached model responses and don't record new ones."
+    )
+    parser.add_argument(
+        "--max-items",
+        type=int,
+        help="Only process the first N rows of the input."
+    )
+    parser.add_argument(
+        "--max-parallel-requests",
+        type=positive_int,
+        default=MAX_CONCURRENT_REQUESTS,
+        help="Most model calls in flight at once (default: %(default)s, or BNS_MAX_WORKERS)."
+    )
+    parser.add_argument(
+        "--investors-per-prompt",
+        type=positive_int,
+        default=CHUNK_SIZE,
+        help="Investors researched in a single prompt (default: %(default)s; 1 disables packing)."
+    )
+    args = parser.parse_args()
+
+    retrying = os.path.abspath(args.input) == os.path.abspath(failed_path)
+    if retrying and not os.path.exists(failed_path):
+        print(f"No failed investors to retry in {failed_path}.")
+        return
+
+    cache = None if args.no_cache else LLMCache(cache_path)
+
+    # Input names are streamed, never materialised as a list
+    names = iter_investor_names(args.input)
+    if args.max_items:
+        names = islice(names, args.max_items)
+
+    # Resume from a previous run by skipping investors already in the output
+    processed = load_processed_names(output_path, index_path)
+
+    # Open output CSV in append mode
+    with open(output_path, 'a', newline='', buffering=output_buffer_size) as csvfile, \
+            open(index_path, 'ab') as index_file:
+        writer = TicketWriter(csvfile, index_file)
+
+        # Write header only if file is empty
+        if os.stat(output_path).st_size == 0:
+            writer.write_header()
+
+        # Research each investor once, however many times it is listed, and
+        # serve cached investors without sending them to the model
+        investors = InvestorTracker(writer, cache, processed)
+        pending = investors.filter(names)
+        # A retry reads the failed-investor file itself, so it isn't appended to;
+        # it is pruned of the investors that now have results once the run is done
+        failed = FailedInvestorWriter(None if retrying else failed_path)
+
+        use_batch_api = args.batch == "always"
+        if args.batch == "auto":
+            # Peek far enough ahead to tell whether a batch job is worth its turnaround
+            head = list(islice(pending, BATCH_API_MIN_ITEMS))
+            use_batch_api = len(head) >= BATCH_API_MIN_ITEMS
+            pending = chain(head, pending)
 
-# Open output CSV in append mode
-with open(output_path, 'a', newline='') as csvfile:
-    fieldnames = ['Investor', 'Ticket size (USD)', 'Rationale']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    
-    # Write header only if file is empty
-    if os.stat(output_path).st_size == 0:
-        writer.writeheader()
-
-    # Iterate and process each row
-    for _, row in df.iterrows():
-        name = row['Potential investor']
-        investor, ticket_size, rationale = classify_ticket(name)
-        
         # Write directly to CSV after each generation
-        writer.writerow({
-            'Investor': investor,
-            'Ticket size (USD)': ticket_size,
-            'Rationale': rationale
-        })
+        try:
+            if use_batch_api:
+                # A batch job needs all its prompts up front
+                for name, ticket in classify_tickets_batch(list(pending), cache):
+                    results, failures = investors.resolve([name], [ticket])
+                    failed.write(failures)
+                    writer.write(results)
+            else:
+                asyncio.run(classify_all(
+                    pending,
+                    writer,
+                    investors,
+                    failed,
+                    cache,
+                    args.max_parallel_requests,
+                    args.investors_per_prompt
+                ))
+        finally:
+            # Make sure everything written is on disk and indexed before closing,
+            # even if the run is interrupted, so resuming doesn't redo those rows
+            writer.sync()
+        failed.close()
+
+    if cache is not None:
+        cache.close()
+
+    print(f"Results are being written to {output_path} as they are generated.")
+    if retrying:
+        done = processed | {key_hash(key) for key in investors.tickets}
+        remaining = prune_failed_investors(failed_path, done)
+        print(f"{remaining} input rows are still listed in {failed_path}.")
+    elif failed.count:
+        print(f"{failed.count} input rows failed and were written to {failed_path}.")
 
-print(f"Results are being written to {output_path} as they are generated.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
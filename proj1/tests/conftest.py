@@ -0,0 +1,19 @@
+import importlib
+import os
+
+import pytest
+
+@pytest.fixture(scope="session")
+def script(tmp_path_factory):
+    """
+    Imports proj1/script.py, which reads its API key from config.ini in the working
+    directory at import time, against a throwaway config.
+    """
+    config_dir = tmp_path_factory.mktemp("config")
+    (config_dir / "config.ini").write_text("[openai]\napi_key = test\n")
+    cwd = os.getcwd()
+    os.chdir(config_dir)
+    try:
+        return importlib.import_module("bns.proj1.script")
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import orjson
+
+from bns.proj1.batch import submit_batch
+
+class UnusedClient:
+    def __getattr__(self, name):
+        raise AssertionError(f"the API was called ({name})")
+
+def test_submit_batch_without_requests_does_not_call_the_api():
+    assert list(submit_batch(UnusedClient(), {})) == []
+
+class FakeBatchClient:
+    """
+    Records uploaded batch input files and completes every job immediately,
+    echoing each request's input as its response body.
+    """
+
+    def __init__(self):
+        self.uploads = {}
+        self.files = SimpleNamespace(create=self.create_file, content=self.file_content)
+        self.batches = SimpleNamespace(create=self.create_batch)
+
+    def create_file(self, file, purpose):
+        file_id = f"file-{len(self.uploads)}"
+        self.uploads[file_id] = file[1]
+        return SimpleNamespace(id=file_id)
+
+    def create_batch(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id=input_file_id, status="completed", output_file_id=input_file_id)
+
+    def file_content(self, file_id):
+        lines = [orjson.loads(line) for line in self.uploads[file_id].split(b"\n")]
+        return SimpleNamespace(content=b"\n".join(
+            orjson.dumps({
+                "custom_id": line["custom_id"],
+                "response": {"status_code": 200, "body": line["body"]}
+            })
+            for line in lines
+        ))
+
+def test_submit_batch_splits_requests_across_jobs():
+    client = FakeBatchClient()
+    bodies = {str(i): {"input": i} for i in range(5)}
+
+    results = list(submit_batch(client, bodies, max_requests=2))
+
+    assert [len(upload.split(b"\n")) for upload in client.uploads.values()] == [2, 2, 1]
+    assert results == [(str(i), {"input": i}) for i in range(5)]
@@ -0,0 +1,31 @@
+import importlib
+
+import pytest
+
+@pytest.fixture
+def calibrate(script):
+    return importlib.import_module("bns.proj1.calibrate")
+
+def test_compare_classifies_answer_pairs(calibrate):
+    assert calibrate.compare(100, 150) == "agree"
+    assert calibrate.compare(100, 300) == "disagree"
+    assert calibrate.compare(None, 300) == "model null"
+    assert calibrate.compare(100, None) == "reference null"
+    assert calibrate.compare(None, None) == "both null"
+    assert calibrate.compare(RuntimeError("boom"), 300) == "error"
+
+def test_summarise_counts_outcomes_and_median_ratio(calibrate):
+    summary = calibrate.summarise([(100, 100), (300, 100), (None, 50), (None, None)])
+    assert summary["agree"] == 1
+    assert summary["disagree"] == 1
+    assert summary["model null"] == 1
+    assert summary["both null"] == 1
+    assert summary["median ratio"] == 2
+
+def test_sample_investors_is_distinct_and_repeatable(calibrate):
+    names = ["Acme", "acme", "", "1234", "Beta", "Gamma", "Delta"]
+    sample = calibrate.sample_investors(names, 3, seed=1)
+    assert len(sample) == 3
+    assert len({name.casefold() for name in sample}) == 3
+    assert not {"", "1234"} & set(sample)
+    assert calibrate.sample_investors(names, 3, seed=1) == sample
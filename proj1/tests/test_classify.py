@@ -0,0 +1,110 @@
+import asyncio
+
+import orjson
+
+from bns.proj1.llm_cache import LLMCache
+
+def reply(name, ticket_size=1):
+    return {"investor": name, "ticket_size": ticket_size, "rationale": "r"}
+
+def fake_prompt_model(monkeypatch, script, respond):
+    """
+    Replaces the model call with `respond(prompt, model)` and returns the list of calls made.
+    """
+    calls = []
+
+    async def prompt_model(prompt, session, instructions=None, text_format=None, model=script.MODEL):
+        calls.append((prompt, model))
+        return respond(prompt, model)
+
+    monkeypatch.setattr(script, "prompt_model", prompt_model)
+    return calls
+
+def test_packed_prompt_api_error_is_not_retried_per_investor(script, monkeypatch):
+    error = RuntimeError("invalid api key")
+
+    def respond(prompt, model):
+        raise error
+
+    calls = fake_prompt_model(monkeypatch, script, respond)
+    names = [f"Inv{i}" for i in range(10)]
+    assert asyncio.run(script.classify_tickets(names, None, None)) == [error] * 10
+    assert len(calls) == 1
+
+def test_mismatched_packed_reply_falls_back_to_one_prompt_per_investor(script, monkeypatch):
+    def respond(prompt, model):
+        if prompt.startswith("Investors: "):
+            return orjson.dumps({"results": [reply("A")]}).decode()
+        return orjson.dumps(reply(prompt.removeprefix("Investor: "), 2)).decode()
+
+    calls = fake_prompt_model(monkeypatch, script, respond)
+    tickets = asyncio.run(script.classify_tickets(["A", "B"], None, None))
+    assert tickets == [("A", 2, "r"), ("B", 2, "r")]
+    assert len(calls) == 3
+
+class Discard:
+    def write(self, *args):
+        pass
+
+def test_each_run_gets_its_own_client_and_closes_it(script, monkeypatch):
+    sessions = []
+
+    async def classify_tickets(chunk, session, cache):
+        assert not session.client.is_closed()
+        sessions.append(session)
+        return [(name, 1, "r") for name in chunk]
+
+    monkeypatch.setattr(script, "classify_tickets", classify_tickets)
+    for _ in range(2):
+        investors = script.InvestorTracker(Discard(), None, set())
+        asyncio.run(script.classify_all(investors.filter(["A"]), Discard(), investors, Discard(), None))
+
+    assert len(sessions) == 2 and sessions[0] is not sessions[1]
+    assert all(session.client.is_closed() for session in sessions)
+
+def test_session_client_leaves_retries_to_prompt_model(script):
+    session = script.ModelSession()
+    assert session.client.max_retries == 0
+    asyncio.run(session.client.close())
+
+def test_packed_answers_are_invalidated_by_editing_the_packed_instructions(script, monkeypatch, tmp_path):
+    def respond(prompt, model):
+        if prompt.startswith("Investors: "):
+            return orjson.dumps({"results": [reply("A"), reply("B")]}).decode()
+        return orjson.dumps(reply(prompt.removeprefix("Investor: "))).decode()
+
+    fake_prompt_model(monkeypatch, script, respond)
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    asyncio.run(script.classify_tickets(["A", "B"], None, cache))
+    asyncio.run(script.classify_tickets(["C"], None, cache))
+    assert script.cached_ticket(cache, "A") == ("A", 1, "r")
+
+    monkeypatch.setattr(script, "BATCH_INSTRUCTIONS", script.BATCH_INSTRUCTIONS + " Be brief.")
+    assert script.cached_ticket(cache, "A") is None
+    assert script.cached_ticket(cache, "C") == ("C", 1, "r")
+    cache.close()
+
+def test_cached_null_answer_only_runs_the_fallback_model(script, monkeypatch, tmp_path):
+    monkeypatch.setattr(script, "FALLBACK_MODEL", "stronger-model")
+
+    def respond(prompt, model):
+        name = prompt.removeprefix("Investor: ")
+        return orjson.dumps(reply(name, 7 if model == "stronger-model" else None)).decode()
+
+    calls = fake_prompt_model(monkeypatch, script, respond)
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    script.cache_ticket(cache, "A", reply("A", None))
+    # A cached null answer without a fallback answer is a miss, so the investor is researched
+    assert script.cached_ticket(cache, "A") is None
+
+    tickets = asyncio.run(script.classify_tickets(["A", "B"], None, cache))
+    assert tickets == [("A", 7, "r"), ("B", 7, "r")]
+    assert sorted(calls) == sorted([
+        ("Investor: A", "stronger-model"),
+        ("Investor: B", script.MODEL),
+        ("Investor: B", "stronger-model")
+    ])
+    # The fallback's answer is cached under its own model and served from then on
+    assert script.cached_ticket(cache, "A") == ("A", 7, "r")
+    assert script.cached_answer(cache, "A") == ("A", None, "r")
+    cache.close()
@@ -0,0 +1,10 @@
+import sys
+
+import pytest
+
+@pytest.mark.parametrize("flag", ["--max-parallel-requests", "--investors-per-prompt"])
+@pytest.mark.parametrize("value", ["0", "-3"])
+def test_counts_must_be_positive(script, monkeypatch, flag, value):
+    monkeypatch.setattr(sys, "argv", ["script", flag, value])
+    with pytest.raises(SystemExit):
+        script.main()
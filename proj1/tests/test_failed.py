@@ -0,0 +1,61 @@
+import csv
+import os
+import sys
+
+import pytest
+
+@pytest.fixture
+def run(script, tmp_path, monkeypatch):
+    """
+    Returns a function that runs main() on `rows` of the input (or on the failed-investor
+    file with retry=True) with the model replaced by `outcome(name)`, which returns a
+    ticket size or an exception. The failed-investor file's path is `run.failed_path`.
+    """
+    input_path = tmp_path / "investor_list.csv"
+    failed_path = str(tmp_path / "failed_investors.csv")
+    monkeypatch.setattr(script, "input_path", str(input_path))
+    monkeypatch.setattr(script, "output_path", str(tmp_path / "output.csv"))
+    monkeypatch.setattr(script, "index_path", str(tmp_path / "output.csv.idx"))
+    monkeypatch.setattr(script, "failed_path", failed_path)
+
+    def run(outcome, rows=(), retry=False):
+        async def classify_tickets(chunk, session, cache):
+            outcomes = [outcome(name) for name in chunk]
+            return [o if isinstance(o, Exception) else (name, o, "r") for name, o in zip(chunk, outcomes)]
+
+        monkeypatch.setattr(script, "classify_tickets", classify_tickets)
+        if not retry:
+            input_path.write_text("Potential investor\n" + "\n".join(rows) + "\n")
+        argv = ["script", "--no-cache", "--investors-per-prompt", "1"]
+        monkeypatch.setattr(sys, "argv", argv + (["--input", failed_path] if retry else []))
+        script.main()
+
+    run.failed_path = failed_path
+    return run
+
+def read_failed(path):
+    with open(path, newline='') as csvfile:
+        return [row['Potential investor'] for row in csv.DictReader(csvfile)]
+
+def test_failed_investor_is_recorded_once_per_listing(run):
+    run(lambda name: RuntimeError("boom") if name == "Acme" else 1, ["Acme", "Beta", "acme", "Acme"])
+    assert read_failed(run.failed_path) == ["Acme", "Acme", "Acme"]
+
+def test_retry_prunes_investors_that_now_have_results(run):
+    run(lambda name: RuntimeError("boom") if name != "Beta" else 1, ["Acme", "Beta", "Gamma", "Acme"])
+    assert read_failed(run.failed_path) == ["Acme", "Acme", "Gamma"]
+
+    run(lambda name: RuntimeError("still down") if name == "Gamma" else 1, retry=True)
+    assert read_failed(run.failed_path) == ["Gamma"]
+
+def test_retry_removes_the_file_once_every_investor_has_a_result(run):
+    run(lambda name: RuntimeError("boom"), ["Acme", "Acme"])
+    assert read_failed(run.failed_path) == ["Acme", "Acme"]
+
+    run(lambda name: 1, retry=True)
+    assert not os.path.exists(run.failed_path)
+
+def test_retry_without_failed_investors_exits_cleanly(run, capsys):
+    run(lambda name: pytest.fail("the model was called"), retry=True)
+    assert "No failed investors to retry" in capsys.readouterr().out
+    assert not os.path.exists(run.failed_path)
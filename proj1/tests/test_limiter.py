@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from bns.proj1.limiter import AdaptiveLimiter, RateLimiter
+
+class FakeClock:
+    """
+    Clock for RateLimiter whose time only moves when it is slept on.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += delay
+        await asyncio.sleep(0)
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def fake_rate_limiter(clock, **limits):
+    return RateLimiter(**limits, clock=clock, sleep=clock.sleep)
+
+def test_adaptive_limiter_caps_calls_in_flight():
+    limiter = AdaptiveLimiter(initial=2, maximum=10)
+    in_flight = peak = 0
+
+    async def call():
+        nonlocal in_flight, peak
+        async with limiter:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+def test_adaptive_limiter_halves_on_rate_limit_down_to_minimum():
+    limiter = AdaptiveLimiter(initial=8, maximum=10, minimum=3)
+
+    async def run():
+        await limiter.on_rate_limited()
+        assert limiter.limit == 4
+        await limiter.on_rate_limited()
+        assert limiter.limit == 3
+
+    asyncio.run(run())
+
+def test_adaptive_limiter_grows_after_successes_up_to_maximum():
+    limiter = AdaptiveLimiter(initial=2, maximum=3, increase_every=2)
+
+    async def run():
+        await limiter.on_success(None)
+        assert limiter.limit == 2
+        await limiter.on_success(None)
+        assert limiter.limit == 3
+        for _ in range(4):
+            await limiter.on_success("100")
+        assert limiter.limit == 3
+
+    asyncio.run(run())
+
+def test_adaptive_limiter_does_not_grow_without_spare_quota():
+    limiter = AdaptiveLimiter(initial=2, maximum=10, increase_every=1)
+
+    async def run():
+        async with limiter:
+            # Only one request left in the window and one already in flight
+            await limiter.on_success("1")
+        assert limiter.limit == 2
+        await limiter.on_success("5")
+        assert limiter.limit == 3
+
+    asyncio.run(run())
+
+def test_adaptive_limiter_rate_limit_resets_growth():
+    limiter = AdaptiveLimiter(initial=4, maximum=10, increase_every=2)
+
+    async def run():
+        await limiter.on_success(None)
+        await limiter.on_rate_limited()
+        await limiter.on_success(None)
+        assert limiter.limit == 2
+
+    asyncio.run(run())
+
+def test_rate_limiter_allows_a_full_minute_up_front(clock):
+    limiter = fake_rate_limiter(clock, requests_per_minute=3)
+
+    async def run():
+        for _ in range(3):
+            await limiter.acquire()
+
+    asyncio.run(run())
+    assert clock.now == 1000.0
+
+def test_rate_limiter_waits_for_requests_to_refill(clock):
+    limiter = fake_rate_limiter(clock, requests_per_minute=60)
+
+    async def run():
+        for _ in range(61):
+            await limiter.acquire()
+
+    asyncio.run(run())
+    assert clock.now == pytest.approx(1001.0)
+
+def test_rate_limiter_waits_for_tokens_to_refill(clock):
+    limiter = fake_rate_limiter(clock, tokens_per_minute=1000)
+
+    async def run():
+        await limiter.acquire(tokens=800)
+        await limiter.acquire(tokens=400)
+
+    asyncio.run(run())
+    # 200 tokens were left, so 200 more take 12s at 1000 per minute
+    assert clock.now == pytest.approx(1012.0)
+
+def test_rate_limiter_oversized_call_only_waits_for_a_full_bucket(clock):
+    limiter = fake_rate_limiter(clock, tokens_per_minute=1000)
+
+    async def run():
+        await limiter.acquire(tokens=500)
+        await limiter.acquire(tokens=5000)
+
+    asyncio.run(run())
+    assert clock.now == pytest.approx(1030.0)
+
+def test_rate_limiter_without_limits_never_waits(clock):
+    limiter = fake_rate_limiter(clock)
+
+    async def run():
+        for _ in range(100):
+            await limiter.acquire(tokens=10**9)
+
+    asyncio.run(run())
+    assert clock.now == 1000.0
@@ -0,0 +1,164 @@
+import asyncio
+import csv
+import os
+import struct
+import sys
+
+import pytest
+
+from bns.proj1.llm_cache import LLMCache
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "output.csv"), str(tmp_path / "output.csv.idx")
+
+def open_writer(script, path, index_path):
+    csvfile = open(path, 'a', newline='')
+    index_file = open(index_path, 'ab')
+    writer = script.TicketWriter(csvfile, index_file)
+    if os.stat(path).st_size == 0:
+        writer.write_header()
+    return writer, csvfile, index_file
+
+def read_rows(path):
+    with open(path, newline='') as csvfile:
+        return [row['Investor'] for row in csv.DictReader(csvfile)]
+
+def make_index_stale(path, index_path):
+    # Backdate the index rather than relying on the filesystem's timestamp resolution
+    mtime = os.stat(path).st_mtime_ns
+    os.utime(index_path, ns=(mtime - 10**9, mtime - 10**9))
+
+def test_load_processed_names_without_output_removes_stale_index(script, paths):
+    path, index_path = paths
+    with open(index_path, 'wb') as index_file:
+        index_file.write(struct.pack("<Q", 1))
+    assert script.load_processed_names(path, index_path) == set()
+    assert not os.path.exists(index_path)
+
+def test_sync_indexes_written_investors(script, paths):
+    path, index_path = paths
+    writer, csvfile, index_file = open_writer(script, path, index_path)
+    writer.write([
+        ("Acme Capital", ("Acme Capital", 1000, "r"), 2),
+        ("", ("", None, None), 1)
+    ])
+    writer.sync()
+    csvfile.close()
+    index_file.close()
+
+    processed = script.load_processed_names(path, index_path)
+    assert processed == {script.key_hash(script.investor_key("acme  CAPITAL"))}
+    assert os.path.getsize(index_path) == 8
+
+def test_load_processed_names_rescans_csv_behind_index(script, paths):
+    path, index_path = paths
+    writer, csvfile, index_file = open_writer(script, path, index_path)
+    writer.write([("A", ("A", 1, "r"), 1)])
+    writer.sync()
+    # Rows flushed to the CSV without a sync, as when the process is killed
+    writer.write([("B", ("B", 2, "r"), 1)])
+    csvfile.flush()
+    csvfile.close()
+    index_file.close()
+    make_index_stale(path, index_path)
+
+    expected = {script.key_hash(script.investor_key(name)) for name in ("A", "B")}
+    assert script.load_processed_names(path, index_path) == expected
+    # The rebuilt index is trusted from then on
+    with open(index_path, 'rb') as index_file:
+        assert {h for (h,) in struct.iter_unpack("<Q", index_file.read())} == expected
+
+def test_load_processed_names_skips_old_error_rows(script, paths):
+    path, index_path = paths
+    with open(path, 'w', newline='') as csvfile:
+        csvfile.write("Investor,Ticket size (USD),Rationale\n")
+        csvfile.write("A,1,r\n")
+        csvfile.write("B,,Error: timed out\n")
+    assert script.load_processed_names(path, index_path) == {script.key_hash("a")}
+
+def test_load_processed_names_ignores_partial_index_entry(script, paths):
+    path, index_path = paths
+    writer, csvfile, index_file = open_writer(script, path, index_path)
+    writer.sync()
+    csvfile.close()
+    index_file.close()
+    with open(index_path, 'wb') as index_file:
+        index_file.write(struct.pack("<Q", 42) + b"\x01\x02\x03")
+    assert script.load_processed_names(path, index_path) == {42}
+
+def test_interrupted_run_resumes_without_duplicates(script, tmp_path, monkeypatch):
+    names = [f"Inv{i}" for i in range(50)]
+    input_path = tmp_path / "investor_list.csv"
+    input_path.write_text("Potential investor\n" + "\n".join(names) + "\n")
+    path, index_path = str(tmp_path / "output.csv"), str(tmp_path / "output.csv.idx")
+    monkeypatch.setattr(script, "input_path", str(input_path))
+    monkeypatch.setattr(script, "output_path", path)
+    monkeypatch.setattr(script, "index_path", index_path)
+    monkeypatch.setattr(script, "failed_path", str(tmp_path / "failed_investors.csv"))
+    monkeypatch.setattr(sys, "argv", ["script", "--no-cache", "--max-parallel-requests", "1"])
+    interrupt_at = "Inv20"
+
+    async def classify_tickets(chunk, session, cache):
+        # Finish chunks in input order, so the earlier ones are written first
+        await asyncio.sleep(0.05 * names.index(chunk[0]) / len(chunk))
+        if chunk[0] == interrupt_at:
+            raise KeyboardInterrupt
+        return [(name, 1, "r") for name in chunk]
+
+    monkeypatch.setattr(script, "classify_tickets", classify_tickets)
+    with pytest.raises(KeyboardInterrupt):
+        script.main()
+    assert 0 < len(read_rows(path)) < len(names)
+
+    interrupt_at = None
+    script.main()
+    assert sorted(read_rows(path), key=names.index) == names
+
+class RecordingWriter:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, results):
+        self.rows.extend((name, ticket, count) for name, ticket, count in results)
+
+def test_tracker_passes_on_first_listing_and_counts_repeats(script):
+    writer = RecordingWriter()
+    investors = script.InvestorTracker(writer, None, set())
+
+    pending = list(investors.filter(["Acme", "acme ", "Beta", "ACME"]))
+    assert pending == ["Acme", "Beta"]
+    results, failures = investors.resolve(pending, [("Acme", 1, "r"), ("Beta", 2, "r")])
+    assert results == [("Acme", ("Acme", 1, "r"), 3), ("Beta", ("Beta", 2, "r"), 1)]
+    assert failures == []
+
+    # Once the result is known, later listings are written without the model
+    assert list(investors.filter(["Beta"])) == []
+    assert writer.rows == [("Beta", ("Beta", 2, "r"), 1)]
+
+def test_tracker_writes_non_names_and_skips_processed(script):
+    writer = RecordingWriter()
+    investors = script.InvestorTracker(writer, None, {script.key_hash("done")})
+
+    assert list(investors.filter(["", "12-34", "Done"])) == []
+    assert writer.rows == [("", ("", None, None), 1), ("12-34", ("12-34", None, None), 1)]
+
+def test_tracker_serves_cached_investors(script, tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    script.cache_ticket(cache, "Acme", {"investor": "Acme", "ticket_size": 5, "rationale": "r"})
+    writer = RecordingWriter()
+    investors = script.InvestorTracker(writer, cache, set())
+
+    assert list(investors.filter(["Acme", "Beta"])) == ["Beta"]
+    assert writer.rows == [("Acme", ("Acme", 5, "r"), 1)]
+    cache.close()
+
+def test_tracker_reports_failures_with_their_count_and_retries_them(script):
+    investors = script.InvestorTracker(RecordingWriter(), None, set())
+    error = ValueError("boom")
+
+    assert list(investors.filter(["Acme", "Acme"])) == ["Acme"]
+    results, failures = investors.resolve(["Acme"], [error])
+    assert results == []
+    assert failures == [("Acme", error, 2)]
+    assert list(investors.filter(["Acme"])) == ["Acme"]
@@ -9,7 +9,8 @@ config.read(config_file)
 
 api_key = config['azure_openai']['api_key']
 endpoint = config['azure_openai']['endpoint']
-deployment = config['azure_openai']['deployment']
+# BNS_LLM_DEPLOYMENT switches to another deployment (e.g. a smaller model) without editing config.ini
+deployment = os.environ.get("BNS_LLM_DEPLOYMENT", config['azure_openai']['deployment'])
 api_version = config['azure_openai']['api_version']
 
 # Initialize Azure OpenAI client
@@ -19,7 +20,7 @@ client = AzureOpenAI(
     azure_endpoint=endpoint
 )
 
-def prompt_model(prompt, temp=1.0):
+def prompt_model(prompt, temp=1.0, deployment=deployment):
     """
     Sends a prompt to the Azure OpenAI model and returns the response.
     """